@@ -1,106 +1,167 @@
+import argparse
 import os
+import numpy as np
+import orjson
 import requests
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-# Get API credentials from environment variables
-API_KEY = os.getenv("alpaca_api")
-API_SECRET = os.getenv("alpaca_secret")
 BASE_URL = "https://data.alpaca.markets/v2"
+OPTIONAL_FIELDS = ("n", "vw")   # bar fields Alpaca may omit; filled with NaN
+
+
+def fetch_bars(symbol: str, start: datetime, end: datetime, session: requests.Session) -> pd.DataFrame:
+    """Fetch hourly bars for a symbol between two UTC datetimes"""
+    endpoint = f"{BASE_URL}/stocks/{symbol}/bars"
+    params = {
+        "timeframe": "1Hour",
+        "start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "end": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "limit": 10000,
+        "adjustment": "all",
+        "feed": "iex",
+        "sort": "asc"
+    }
+
+    # One list per field; avoids building a DataFrame from ~40k dicts
+    cols = {"t": [], "o": [], "h": [], "l": [], "c": [], "v": [], "n": [], "vw": []}
+    page_count = 0
+    while True:
+        page_count += 1
+        print(f"Fetching page {page_count}...")
+
+        r = session.get(endpoint, params=params)
+        r.raise_for_status()
+        data = orjson.loads(r.content)
+        bars = data.get("bars", [])
+
+        if not bars:
+            break
+
+        # t/o/h/l/c/v are always present; n and vw can be missing on some bars
+        for key, values in cols.items():
+            if key in OPTIONAL_FIELDS:
+                values.extend(b.get(key, np.nan) for b in bars)
+            else:
+                values.extend(b[key] for b in bars)
+        print(f"  Got {len(bars)} bars, total: {len(cols['t'])}")
+
+        if "next_page_token" in data and data["next_page_token"]:
+            params["page_token"] = data["next_page_token"]
+        else:
+            break
+
+    # Explicit dtypes: no per-column inference pass. Prices stay float64;
+    # float32 cannot hold four-decimal quotes like 3000.1234 exactly.
+    # np.fromiter with count= allocates each array exactly once.
+    n_bars = len(cols["t"])
+    trades = np.fromiter(cols["n"], dtype=np.float64, count=n_bars)
+    if not np.isnan(trades).any():   # keep integer counts unless a bar lacked n
+        trades = trades.astype(np.int64)
+    return pd.DataFrame({
+        # Alpaca timestamps are UTC ("...T15:30:00Z"); without the Z, NumPy's C
+        # ISO-8601 parser reads them straight into tz-naive datetime64
+        "time": np.asarray([t.rstrip("Z") for t in cols["t"]], dtype="datetime64[ns]"),
+        "open": np.fromiter(cols["o"], dtype=np.float64, count=n_bars),
+        "high": np.fromiter(cols["h"], dtype=np.float64, count=n_bars),
+        "low": np.fromiter(cols["l"], dtype=np.float64, count=n_bars),
+        "close": np.fromiter(cols["c"], dtype=np.float64, count=n_bars),
+        "volume": np.fromiter(cols["v"], dtype=np.int64, count=n_bars),
+        "n": trades,
+        "vw": np.fromiter(cols["vw"], dtype=np.float64, count=n_bars),
+    })
+
+
+def save(df: pd.DataFrame, symbol: str, formats=("parquet",)) -> None:
+    """Write bars as Parquet and/or CSV named after the symbol"""
+    # Parquet is the canonical cache format
+    if "parquet" in formats:
+        output_filename = f"{symbol}_hourly_data.parquet"
+        df.to_parquet(output_filename, engine="pyarrow", compression="zstd", index=False)
+        print(f"\nData saved to {output_filename}")
+
+    # Human-readable copy
+    if "csv" in formats:
+        csv_filename = f"{symbol}_hourly_data.csv"
+        # Every column is numeric except time, so format whole columns with
+        # NumPy's C loops and join them, bypassing to_csv's per-cell machinery
+        trades, vwap = df["n"].values, df["vw"].values
+        if trades.dtype.kind == "f":   # some bar lacked n: counts are still written as integers
+            trades = np.where(np.isnan(trades), "", np.nan_to_num(trades).astype(np.int64).astype(str))
+        fields = [
+            np.char.add(np.datetime_as_string(df["time"].values, unit="s"), "Z"),
+            *(np.char.mod("%.4f", df[c].values) for c in ("open", "high", "low", "close")),
+            df["volume"].values.astype(str),
+            trades.astype(str),
+            # VWAP is computed, not a quote: keep full precision
+            np.where(np.isnan(vwap), "", vwap.astype(str)),
+        ]
+        lines = fields[0]
+        for field in fields[1:]:
+            lines = np.char.add(np.char.add(lines, ","), field)
+        with open(csv_filename, "wb", buffering=1024 * 1024) as f:
+            f.write((",".join(df.columns) + "\n").encode())
+            f.write(("\n".join(lines) + "\n").encode())
+        print(f"Data also saved to {csv_filename}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fetch ~5 years of hourly bars from Alpaca")
+    parser.add_argument("--csv", action="store_true", help="also write a CSV copy next to the Parquet file")
+    args = parser.parse_args()
+
+    # Load environment variables
+    load_dotenv()
+
+    # Get API credentials from environment variables
+    api_key = os.getenv("alpaca_api")
+    api_secret = os.getenv("alpaca_secret")
+
+    # Check if API credentials are loaded
+    if not api_key or not api_secret:
+        print("Error: API credentials not found in .env file")
+        print("Please ensure alpaca_api and alpaca_secret are set in your .env file")
+        exit(1)
+
+    print(f"API Key loaded: {api_key[:8]}...")
+    print(f"API Secret loaded: {api_secret[:8]}...")
+
+    # Reuse one connection across all pages
+    session = requests.Session()
+    session.headers.update({
+        "APCA-API-KEY-ID": api_key,
+        "APCA-API-SECRET-KEY": api_secret
+    })
+
+    symbol = "AAPL"
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(days=5*365)   # ~5 years
+
+    print(f"Fetching data for {symbol} from {start.date()} to {end.date()}")
+    print("This may take a few minutes...")
+
+    df = fetch_bars(symbol, start, end, session)
+    print(f"\nTotal bars fetched: {len(df)}")
+
+    if df.empty:
+        print("No data was fetched. Check your API credentials and symbol.")
+        return
 
-# Check if API credentials are loaded
-if not API_KEY or not API_SECRET:
-    print("Error: API credentials not found in .env file")
-    print("Please ensure alpaca_api and alpaca_secret are set in your .env file")
-    exit(1)
-
-print(f"API Key loaded: {API_KEY[:8]}...")
-print(f"API Secret loaded: {API_SECRET[:8]}...")
-
-symbol = "AAPL"
-endpoint = f"{BASE_URL}/stocks/{symbol}/bars"
-
-end = datetime.utcnow()
-start = end - timedelta(days=5*365)   # ~5 years
-
-params = {
-    "timeframe": "1Hour",
-    "start": start.isoformat() + "Z",
-    "end": end.isoformat() + "Z",
-    "limit": 10000,
-    "adjustment": "all",
-    "feed": "iex",
-    "sort": "asc"
-}
-
-headers = {
-    "APCA-API-KEY-ID": API_KEY,
-    "APCA-API-SECRET-KEY": API_SECRET
-}
-
-print(f"Fetching data for {symbol} from {start.date()} to {end.date()}")
-print("This may take a few minutes...")
-
-rows = []
-page_count = 0
-while True:
-    page_count += 1
-    print(f"Fetching page {page_count}...")
-    
-    r = requests.get(endpoint, headers=headers, params=params)
-    r.raise_for_status()
-    data = r.json()
-    bars = data.get("bars", [])
-    
-    if not bars:
-        break
-    
-    rows.extend(bars)
-    print(f"  Got {len(bars)} bars, total: {len(rows)}")
-    
-    if "next_page_token" in data and data["next_page_token"]:
-        params["page_token"] = data["next_page_token"]
-    else:
-        break
-
-print(f"\nTotal bars fetched: {len(rows)}")
-
-if rows:
-    df = pd.DataFrame(rows)
-    df.rename(columns={"t":"time","o":"open","h":"high","l":"low","c":"close","v":"volume"}, inplace=True)
-    df["time"] = pd.to_datetime(df["time"])
-    
-    # Convert timezone-aware datetimes to timezone-naive for Excel compatibility
-    df["time"] = df["time"].dt.tz_localize(None)
-    
     print("\nDataFrame Info:")
     print(df.info())
-    
+
     print("\nFirst 5 rows:")
     print(df.head())
-    
+
     print("\nLast 5 rows:")
     print(df.tail())
-    
+
     print(f"\nDate range: {df['time'].min()} to {df['time'].max()}")
     print(f"Total rows: {len(df)}")
-    
-    # Save to CSV
-    output_filename = f"{symbol}_hourly_data.csv"
-    df.to_csv(output_filename, index=False)
-    print(f"\nData saved to {output_filename}")
-    
-    # Save to Excel if openpyxl is available
-    try:
-        excel_filename = f"{symbol}_hourly_data.xlsx"
-        df.to_excel(excel_filename, index=False, engine='openpyxl')
-        print(f"Data also saved to {excel_filename}")
-    except ImportError:
-        print("openpyxl not available, Excel export skipped")
-        
-else:
-    print("No data was fetched. Check your API credentials and symbol.")
+
+    save(df, symbol, formats=("parquet", "csv") if args.csv else ("parquet",))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,15 @@ Signal Generator for SEC filing data
 Processes extracted data to generate trading/investment signals
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional
 
 
 class SignalGenerator:
     """Generate signals from extracted SEC filing data"""
     
-    def __init__(self):
+    def __init__(self, on_signal: Optional[Callable[[Dict[str, Any]], None]] = None):
+        # With a sink, each signal is handed off as it is made and nothing is kept in memory
+        self.on_signal = on_signal
         self.signals = []
     
     def process_filing(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -26,11 +28,14 @@ class SignalGenerator:
             'timestamp': None
         }
         
-        self.signals.append(signal)
+        if self.on_signal is not None:
+            self.on_signal(signal)
+        else:
+            self.signals.append(signal)
         return signal
     
     def get_all_signals(self) -> List[Dict[str, Any]]:
-        """Get all generated signals"""
+        """Get all generated signals (always empty when an on_signal sink is set)"""
         return self.signals
     
     def clear_signals(self):
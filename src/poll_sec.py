@@ -2,18 +2,22 @@
 """
 poll_sec.py  ── 60-second EDGAR "fire-hose" poller
 ––––––––––––––––––––––––––––––––––––––––––––––––––
- • Hits /LATEST/search-index page-1 every minute
+ • Hits /LATEST/search-index page-1 every minute (more pages / faster via
+   main(max_pages=..., interval=...); see pol_sec_test.py)
  • De-duplicates on accession (adsh) in a tiny SQLite DB
  • Drops brand-new filings into dispatch_queue for downstream workers
 """
 
+import asyncio
+import collections
 import datetime as dt
-import json
+import httpx
+import orjson
 import pathlib
 import sqlite3
+import sys
 import time
-import requests
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 # ──────────────────────────────────────────────────────────
 # CONFIG  – change these two lines if you need to
@@ -23,22 +27,51 @@ USER_AGENT = "sec-poller/1.0 (you@example.com)"   # use your email
 # ──────────────────────────────────────────────────────────
 
 BASE_URL = "https://efts.sec.gov/LATEST/search-index"
+ARCHIVE_BASE = "https://www.sec.gov/Archives/edgar/data/"
+_NODASH = str.maketrans("", "", "-")   # adsh 0000320193-24-000123 → archive folder name
 HEADERS  = {"User-Agent": USER_AGENT,
             "Accept": "application/json",
             "Accept-Encoding": "gzip"}
 
+POLL_INTERVAL_SECONDS = 60           # one EFTS poll per tick
+MAX_PAGES = 1                         # EFTS pages (100 filings each) per poll
+OPTIMIZE_INTERVAL_SECONDS = 15 * 60   # PRAGMA optimize cadence
+SEEN_CACHE_SIZE = 4096                # recent adsh kept in memory (EFTS page = 100)
+
+# Hot-path SQL, defined once so every call reuses the same cached prepared statement
+SQL_INSERT_QUEUE = """INSERT INTO dispatch_queue(adsh, form, cik, url, company_name, filing_date, filing_href, enqueued_ts)
+                      VALUES(?, ?, ?, ?, ?, ?, ?, ?)"""
+# Claim a whole page of accessions in one statement; RETURNING yields only the new ones (SQLite 3.35+)
+SQL_CLAIM_NEW = """INSERT INTO adsh_seen(adsh, first_seen_ts)
+                   SELECT value, ? FROM json_each(?) WHERE true
+                   ON CONFLICT DO NOTHING RETURNING adsh"""
+SQL_RECENT_SEEN = "SELECT adsh FROM adsh_seen ORDER BY first_seen_ts DESC LIMIT ?"
+
 
 # ──────────────────────────────────────────────────────────
 # SQLite setup (run once, then reused)
 # ──────────────────────────────────────────────────────────
 def init_db(path: pathlib.Path) -> sqlite3.Connection:
     print(f"[INFO] Initializing database at {path}")
-    conn = sqlite3.connect(path)
+    # check_same_thread=False: batches are written from a worker thread (one at a time)
+    conn = sqlite3.connect(path, cached_statements=256, check_same_thread=False)
+    conn.isolation_level = None   # autocommit; the poll loop opens its own transactions
+
+    # WAL + relaxed sync: one fsync per commit, readers never block the poller
+    mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if mode != "wal":
+        print(f"[WARN] Could not enable WAL (journal_mode={mode})")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")      # ~20 MB page cache
+    conn.execute("PRAGMA mmap_size=268435456")    # 256 MB memory-mapped reads
+    conn.execute("PRAGMA busy_timeout=5000")      # wait for readers instead of failing
     cur  = conn.cursor()
+    # WITHOUT ROWID: rows live in the adsh B-tree itself, no separate rowid table + PK index
     cur.execute("""CREATE TABLE IF NOT EXISTS adsh_seen (
                        adsh TEXT PRIMARY KEY,
                        first_seen_ts TEXT
-                   )""")
+                   ) WITHOUT ROWID""")
     cur.execute("""CREATE TABLE IF NOT EXISTS dispatch_queue (
                        id INTEGER PRIMARY KEY AUTOINCREMENT,
                        adsh TEXT,
@@ -51,6 +84,9 @@ def init_db(path: pathlib.Path) -> sqlite3.Connection:
                        enqueued_ts TEXT,
                        processed INTEGER DEFAULT 0
                    )""")
+    # Partial index: downstream workers scan only the unprocessed tail of the queue
+    cur.execute("""CREATE INDEX IF NOT EXISTS idx_dispatch_unprocessed
+                   ON dispatch_queue(processed) WHERE processed = 0""")
     conn.commit()
     print(f"[INFO] Database initialized successfully")
     return conn
@@ -59,83 +95,168 @@ def init_db(path: pathlib.Path) -> sqlite3.Connection:
 # ──────────────────────────────────────────────────────────
 # One request = one page (≤100 newest filings)
 # ──────────────────────────────────────────────────────────
-def fetch_latest(date_iso: str) -> List[Dict]:
-    print(f"[POLL] Fetching latest filings for {date_iso}")
+async def fetch_page(client: httpx.AsyncClient, date_iso: str, page: int) -> List[Dict]:
     params = {
         "forms":   "-0",     # all forms
         "startdt": date_iso,
         "enddt":   date_iso,
-        "page":    1,
-        "from":    0,
+        "page":    page,
+        "from":    (page - 1) * 100,
     }
-    r = requests.get(BASE_URL, params=params, headers=HEADERS, timeout=10)
+    r = await client.get(BASE_URL, params=params)
     r.raise_for_status()
-    hits = r.json()["hits"]["hits"]
-    print(f"[POLL] Found {len(hits)} filings")
-    return hits
+    return orjson.loads(r.content)["hits"]["hits"]
+
+
+async def fetch_latest(client: httpx.AsyncClient, date_iso: str,
+                       max_pages: int = MAX_PAGES) -> List[Dict]:
+    print(f"[POLL] Fetching latest filings for {date_iso}")
+    if max_pages == 1:
+        hits = await fetch_page(client, date_iso, 1)
+        print(f"[POLL] Found {len(hits)} filings")
+        return hits
+
+    # Request all pages at once; they share one HTTP/2 connection
+    pages = await asyncio.gather(*(fetch_page(client, date_iso, page) for page in range(1, max_pages + 1)),
+                                 return_exceptions=True)
+    all_hits = []
+    for page, hits in enumerate(pages, start=1):
+        if isinstance(hits, Exception):
+            print(f"[ERROR] Failed to fetch page {page}: {hits}")
+            break
+        if not hits:              # no more filings on this page
+            break
+        all_hits.extend(hits)
+        print(f"[POLL] Page {page}: Found {len(hits)} filings")
+        if len(hits) < 100:       # last page has fewer than 100 filings
+            break
+    print(f"[POLL] Total filings found: {len(all_hits)}")
+    return all_hits
 
 
-def build_url(hit: Dict) -> str:
-    src        = hit["_source"]
-    cik        = src["ciks"][0].lstrip("0")
-    accession  = src["adsh"].replace("-", "")
-    primary    = hit["_id"].split(":", 1)[1]
-    return f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession}/{primary}"
+# ──────────────────────────────────────────────────────────
+# One cycle's writes (runs off the event loop)
+# ──────────────────────────────────────────────────────────
+def write_batch(conn: sqlite3.Connection, rows: Dict[str, Tuple], ts: str) -> List[Tuple]:
+    cur = conn.cursor()
+
+    # One transaction per cycle (opened after the fetch so the write
+    # lock is never held across the network call)
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        # dedup: one statement for the whole page, then queue only what it reports as new
+        cur.execute(SQL_CLAIM_NEW, (ts, orjson.dumps(list(rows)).decode()))
+        claimed = {adsh for (adsh,) in cur.fetchall()}
+        new_rows = [row for adsh, row in rows.items() if adsh in claimed]
+        cur.executemany(SQL_INSERT_QUEUE, new_rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()   # drop the half-written cycle
+        raise
+    return new_rows
 
 
 # ──────────────────────────────────────────────────────────
 # Main loop
 # ──────────────────────────────────────────────────────────
-def main() -> None:
+async def poll_loop(conn: sqlite3.Connection, max_pages: int = MAX_PAGES,
+                    interval: float = POLL_INTERVAL_SECONDS) -> None:
+    last_optimize = time.monotonic()
+
+    # LRU of recently seen adsh: repeats from the last poll never reach SQLite
+    recent = conn.execute(SQL_RECENT_SEEN, (SEEN_CACHE_SIZE,)).fetchall()
+    seen = collections.OrderedDict((adsh, None) for (adsh,) in reversed(recent))
+
+    day, today = None, None   # query date string, rebuilt only when the local date rolls over
+
+    # One keep-alive client for the process: no fresh TCP+TLS handshake to EFTS every poll
+    async with httpx.AsyncClient(http2=True, headers=HEADERS, timeout=10) as client:
+        next_tick = time.monotonic()   # monotonic: immune to NTP / wall-clock jumps
+        while True:
+            now = dt.datetime.now().astimezone()   # one clock read per cycle (local, tz-aware)
+            if now.date() != day:
+                day = now.date()
+                today = day.isoformat()
+
+            try:
+                # One UTC timestamp per cycle, same format as SQLite's datetime('now')
+                ts = now.astimezone(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                # First hit per accession wins (EFTS returns one hit per document)
+                rows = {}
+                for hit in await fetch_latest(client, today, max_pages):
+                    src  = hit["_source"]
+                    adsh = src["adsh"]
+                    if adsh in seen:
+                        seen.move_to_end(adsh)
+                        continue
+                    if adsh in rows:
+                        continue
+
+                    form = src["form"]
+                    cik  = src["ciks"][0]
+
+                    # Archive URL built inline (no per-hit function call)
+                    accession = adsh.translate(_NODASH)
+                    primary   = hit["_id"].partition(":")[2]
+                    url  = f"{ARCHIVE_BASE}{cik.lstrip('0')}/{accession}/{primary}"
+                    
+                    # Extract additional attributes
+                    company_name = src.get("companyName", "")
+                    filing_date = src.get("filingDate", "")
+                    filing_href = src.get("filingHref", "")
+
+                    rows[adsh] = (adsh, form, cik, url, company_name, filing_date, filing_href, ts)
+
+                # SQLite blocks (busy_timeout, fsync); keep that off the event loop.
+                # Nothing new after the LRU: skip the write lock and the empty commit
+                new_rows = await asyncio.to_thread(write_batch, conn, rows, ts) if rows else []
+
+                # Only after the commit, so a rolled-back cycle is retried next time
+                seen.update(dict.fromkeys(rows))
+                while len(seen) > SEEN_CACHE_SIZE:
+                    seen.popitem(last=False)
+                new_lines = [f"[NEW] {adsh} {form} {company_name} → queued"
+                             for adsh, form, _, _, company_name, *_ in new_rows]
+                # One terminal write per cycle instead of a flushed write per filing
+                if new_lines:
+                    print("\n".join(new_lines))
+
+                # Refresh query-planner stats now and then
+                if time.monotonic() - last_optimize >= OPTIMIZE_INTERVAL_SECONDS:
+                    conn.execute("PRAGMA optimize")
+                    last_optimize = time.monotonic()
+                print(f"[LOOP] Polling cycle completed (started {now.strftime('%H:%M:%S')})")
+
+            except Exception as exc:
+                print(f"[ERROR] {exc}")
+
+            # sleep until the next scheduled tick; after an overrun, restart the schedule from now
+            next_tick += interval
+            sleep_left = next_tick - time.monotonic()
+            if sleep_left > 0:
+                print(f"[SLEEP] Waiting {sleep_left:.1f} seconds until next poll...")
+            sys.stdout.flush()   # the cycle's output goes out in one flush, before idling
+            if sleep_left > 0:
+                await asyncio.sleep(sleep_left)
+            else:
+                next_tick = time.monotonic()
+
+
+def main(max_pages: int = MAX_PAGES, interval: float = POLL_INTERVAL_SECONDS) -> None:
     print("[START] SEC EDGAR poller starting up...")
     print(f"[CONFIG] Database: {DB_PATH}")
     print(f"[CONFIG] User Agent: {USER_AGENT}")
-    print("[INFO] Polling every 60 seconds for new SEC filings...")
+    print(f"[INFO] Polling every {interval} seconds for new SEC filings...")
     print("[INFO] Press Ctrl+C to stop")
     print("-" * 60)
     
     conn = init_db(DB_PATH)
-    cur  = conn.cursor()
-
-    while True:
-        start = time.time()
-        today = dt.date.today().isoformat()
-
-        try:
-            for hit in fetch_latest(today):
-                adsh = hit["_source"]["adsh"]
-
-                # dedup (INSERT OR IGNORE = O(1) check)
-                cur.execute("INSERT OR IGNORE INTO adsh_seen(adsh, first_seen_ts) VALUES(?, datetime('now'))",
-                            (adsh,))
-                if cur.rowcount == 0:          # already seen
-                    continue
-
-                form = hit["_source"]["form"]
-                cik  = hit["_source"]["ciks"][0]
-                url  = build_url(hit)
-                
-                # Extract additional attributes
-                company_name = hit["_source"].get("companyName", "")
-                filing_date = hit["_source"].get("filingDate", "")
-                filing_href = hit["_source"].get("filingHref", "")
-
-                cur.execute("""INSERT INTO dispatch_queue(adsh, form, cik, url, company_name, filing_date, filing_href, enqueued_ts)
-                               VALUES(?, ?, ?, ?, ?, ?, ?, datetime('now'))""",
-                            (adsh, form, cik, url, company_name, filing_date, filing_href))
-                print(f"[NEW] {adsh} {form} {company_name} → queued", flush=True)
-
-            conn.commit()
-            print(f"[LOOP] Polling cycle completed at {dt.datetime.now().strftime('%H:%M:%S')}")
-
-        except Exception as exc:
-            print(f"[ERROR] {exc}", flush=True)
-
-        # sleep until 60 s since loop start
-        sleep_left = 60 - (time.time() - start)
-        if sleep_left > 0:
-            print(f"[SLEEP] Waiting {sleep_left:.1f} seconds until next poll...")
-            time.sleep(sleep_left)
+    try:
+        asyncio.run(poll_loop(conn, max_pages, interval))
+    except KeyboardInterrupt:
+        print("[STOP] Poller stopped")
+    finally:
+        conn.close()   # checkpoints the WAL back into the main file
 
 
 if __name__ == "__main__":